@@ -5,17 +5,33 @@ Dashboard en tiempo real para monitorear todas las integraciones empresariales
 """
 
 import asyncio
+import gzip
+import hashlib
 import json
 import logging
+import random
+import secrets
+from collections import deque
+from itertools import islice
 from datetime import datetime, timezone, timedelta
-from typing import Dict, List, Any
-from dataclasses import dataclass, asdict
+from typing import Deque, Dict, List, Optional, Any, Set, Tuple
+from dataclasses import dataclass
 import os
 
 import aiohttp
-from aiohttp import web
+from aiohttp import web, WSMsgType
 import aiohttp_cors
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Configuración de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -23,7 +39,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@dataclass
+_UTC = timezone.utc
+
+# Tamaño máximo aceptado para el cuerpo de una petición (webhooks)
+_MAX_REQUEST_BYTES = 1024 ** 2
+
+def _now_iso() -> str:
+    """Marca de tiempo actual en UTC (ISO 8601)"""
+    return datetime.now(_UTC).isoformat()
+
+def _json_default(obj: Any) -> Any:
+    """Convertir fechas y dataclasses para el encoder estándar de json"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, (IntegrationMetric, WorkflowExecution)):
+        return obj._as_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _dumps(data: Any) -> bytes:
+    """Serializar a JSON usando orjson si está disponible"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_DATACLASS | orjson.OPT_NAIVE_UTC)
+    return json.dumps(data, default=_json_default).encode('utf-8')
+
+def _loads(raw: bytes) -> Any:
+    """Deserializar JSON usando orjson si está disponible"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def _json(data: Any, status: int = 200) -> web.Response:
+    """Crear respuesta JSON serializada con _dumps"""
+    return web.Response(body=_dumps(data), status=status, content_type='application/json')
+
+@dataclass(slots=True)
 class IntegrationMetric:
     """Métrica de una integración"""
     service: str
@@ -35,8 +84,22 @@ class IntegrationMetric:
     total_requests: int
     error_count: int
     uptime_percentage: float
+    
+    def _as_dict(self) -> Dict[str, Any]:
+        """Convertir la métrica a diccionario sin la copia profunda de asdict()"""
+        return {
+            "service": self.service,
+            "status": self.status,
+            "response_time": self.response_time,
+            "success_rate": self.success_rate,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+            "total_requests": self.total_requests,
+            "error_count": self.error_count,
+            "uptime_percentage": self.uptime_percentage
+        }
 
-@dataclass
+@dataclass(slots=True)
 class WorkflowExecution:
     """Ejecución de workflow"""
     workflow_id: str
@@ -48,57 +111,23 @@ class WorkflowExecution:
     input_data: Dict[str, Any]
     output_data: Dict[str, Any]
     error_message: str
-
-class IntegrationDashboard:
-    """Dashboard de monitoreo de integraciones"""
-    
-    def __init__(self):
-        self.app = web.Application()
-        self.scs_url = os.getenv('SCS_URL', 'http://localhost:23456')
-        self.scs_api_key = os.getenv('SCS_API_KEY')
-        self.n8n_url = os.getenv('N8N_URL', 'http://localhost:5678')
-        self.n8n_api_key = os.getenv('N8N_API_KEY')
-        
-        # Almacenamiento de métricas
-        self.integration_metrics: Dict[str, IntegrationMetric] = {}
-        self.workflow_executions: List[WorkflowExecution] = []
-        self.system_events: List[Dict[str, Any]] = []
-        
-        # Configurar CORS
-        cors = aiohttp_cors.setup(self.app, defaults={
-            "*": aiohttp_cors.ResourceOptions(
-                allow_credentials=True,
-                expose_headers="*",
-                allow_headers="*",
-                allow_methods="*"
-            )
-        })
-        
-        # Configurar rutas
-        self._setup_routes()
-        self._add_cors_routes(cors)
-        
-        # Session HTTP
-        self.session = None
-    
-    def _setup_routes(self):
-        """Configurar rutas del dashboard"""
-        self.app.router.add_get('/', self.serve_dashboard)
-        self.app.router.add_get('/api/status', self.get_system_status)
-        self.app.router.add_get('/api/metrics', self.get_integration_metrics)
-        self.app.router.add_get('/api/workflows', self.get_workflow_executions)
-        self.app.router.add_get('/api/events', self.get_system_events)
-        self.app.router.add_post('/api/webhook', self.handle_webhook)
-        self.app.router.add_get('/health', self.health_check)
     
-    def _add_cors_routes(self, cors):
-        """Agregar CORS a todas las rutas"""
-        for route in list(self.app.router.routes()):
-            cors.add(route)
-    
-    async def serve_dashboard(self, request):
-        """Servir HTML del dashboard"""
-        html_content = """
+    def _as_dict(self) -> Dict[str, Any]:
+        """Convertir la ejecución a diccionario, compartiendo input_data/output_data"""
+        return {
+            "workflow_id": self.workflow_id,
+            "workflow_name": self.workflow_name,
+            "status": self.status,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration": self.duration,
+            "input_data": self.input_data,
+            "output_data": self.output_data,
+            "error_message": self.error_message
+        }
+
+# HTML del dashboard, codificado y comprimido una sola vez al importar el módulo
+_DASHBOARD_HTML = """
 <!DOCTYPE html>
 <html lang="es">
 <head>
@@ -244,9 +273,22 @@ class IntegrationDashboard:
 
     <script>
         let performanceChart;
+        let workflowExecutions = [];
+        let systemEvents = [];
+        
+        // Referencias a elementos del DOM, resueltas una sola vez al cargar
+        const el = {};
+        
+        function cacheElements() {
+            for (const id of ['lastUpdate', 'activeIntegrations', 'workflowsToday', 'successRate',
+                              'avgResponseTime', 'integrationStatus', 'workflowExecutions',
+                              'systemEvents', 'performanceChart']) {
+                el[id] = document.getElementById(id);
+            }
+        }
         
         async function initChart() {
-            const ctx = document.getElementById('performanceChart').getContext('2d');
+            const ctx = el.performanceChart.getContext('2d');
             performanceChart = new Chart(ctx, {
                 type: 'line',
                 data: {
@@ -274,27 +316,24 @@ class IntegrationDashboard:
         async function refreshData() {
             try {
                 // Actualizar timestamp
-                document.getElementById('lastUpdate').textContent = new Date().toLocaleTimeString();
+                el.lastUpdate.textContent = new Date().toLocaleTimeString();
                 
-                // Obtener datos del sistema
-                const [status, metrics, workflows, events] = await Promise.all([
-                    fetch('/api/status').then(r => r.json()),
-                    fetch('/api/metrics').then(r => r.json()),
-                    fetch('/api/workflows').then(r => r.json()),
-                    fetch('/api/events').then(r => r.json())
-                ]);
+                // Obtener datos del sistema en una sola petición
+                const { status, metrics, workflows, events } = await fetch('/api/snapshot').then(r => r.json());
                 
                 // Actualizar métricas principales
-                updateMainMetrics(status);
+                updateMainMetrics(status.summary);
                 
                 // Actualizar estado de integraciones
                 updateIntegrationStatus(metrics);
                 
-                // Actualizar ejecuciones de workflows
-                updateWorkflowExecutions(workflows);
+                // Actualizar ejecuciones de workflows (más recientes primero)
+                workflowExecutions = workflows.reverse();
+                updateWorkflowExecutions(workflowExecutions);
                 
-                // Actualizar eventos del sistema
-                updateSystemEvents(events);
+                // Actualizar eventos del sistema (más recientes primero)
+                systemEvents = events.reverse();
+                updateSystemEvents(systemEvents);
                 
                 // Actualizar gráfico de rendimiento
                 updatePerformanceChart(metrics);
@@ -304,33 +343,16 @@ class IntegrationDashboard:
             }
         }
         
-        function updateMainMetrics(status) {
-            document.getElementById('activeIntegrations').textContent = status.connected_integrations || 0;
-            
-            // Calcular workflows del día
-            const today = new Date().toISOString().split('T')[0];
-            const workflowsToday = status.workflow_executions?.filter(w => 
-                w.start_time.startsWith(today)
-            ).length || 0;
-            document.getElementById('workflowsToday').textContent = workflowsToday;
-            
-            // Calcular tasa de éxito
-            const totalRequests = Object.values(status.integrations || {})
-                .reduce((sum, integration) => sum + (integration.metrics?.total_requests || 0), 0);
-            const totalErrors = Object.values(status.integrations || {})
-                .reduce((sum, integration) => sum + (integration.metrics?.error_count || 0), 0);
-            const successRate = totalRequests > 0 ? ((totalRequests - totalErrors) / totalRequests * 100).toFixed(1) : 0;
-            document.getElementById('successRate').textContent = successRate + '%';
-            
-            // Tiempo promedio de respuesta
-            const avgResponseTime = Object.values(status.integrations || {})
-                .reduce((sum, integration) => sum + (integration.metrics?.response_time || 0), 0) / 
-                Object.keys(status.integrations || {}).length || 0;
-            document.getElementById('avgResponseTime').textContent = Math.round(avgResponseTime) + 'ms';
+        function updateMainMetrics(summary) {
+            // Los indicadores llegan ya agregados desde el servidor
+            el.activeIntegrations.textContent = summary.active;
+            el.workflowsToday.textContent = summary.workflows_today;
+            el.successRate.textContent = summary.success_rate + '%';
+            el.avgResponseTime.textContent = summary.avg_response_time + 'ms';
         }
         
         function updateIntegrationStatus(metrics) {
-            const container = document.getElementById('integrationStatus');
+            const container = el.integrationStatus;
             container.innerHTML = '';
             
             Object.entries(metrics).forEach(([service, metric]) => {
@@ -359,7 +381,7 @@ class IntegrationDashboard:
         }
         
         function updateWorkflowExecutions(workflows) {
-            const tbody = document.getElementById('workflowExecutions');
+            const tbody = el.workflowExecutions;
             tbody.innerHTML = '';
             
             workflows.slice(0, 10).forEach(workflow => {
@@ -390,7 +412,7 @@ class IntegrationDashboard:
         }
         
         function updateSystemEvents(events) {
-            const container = document.getElementById('systemEvents');
+            const container = el.systemEvents;
             container.innerHTML = '';
             
             events.slice(0, 20).forEach(event => {
@@ -430,6 +452,40 @@ class IntegrationDashboard:
             performanceChart.update('none');
         }
         
+        function connectUpdates() {
+            // Recibir actualizaciones del servidor en lugar de hacer polling
+            const protocol = location.protocol === 'https:' ? 'wss' : 'ws';
+            const socket = new WebSocket(`${protocol}://${location.host}/ws`);
+            
+            socket.onmessage = (message) => {
+                const { type, payload } = JSON.parse(message.data);
+                el.lastUpdate.textContent = new Date().toLocaleTimeString();
+                
+                if (type === 'events') {
+                    systemEvents.unshift(...payload.reverse());
+                    systemEvents.length = Math.min(systemEvents.length, 100);
+                    updateSystemEvents(systemEvents);
+                } else if (type === 'workflow') {
+                    workflowExecutions.unshift(payload);
+                    workflowExecutions.length = Math.min(workflowExecutions.length, 50);
+                    updateWorkflowExecutions(workflowExecutions);
+                } else if (type === 'summary') {
+                    updateMainMetrics(payload);
+                } else if (type === 'metrics') {
+                    updateIntegrationStatus(payload);
+                    updatePerformanceChart(payload);
+                }
+            };
+            
+            // Reconectar y resincronizar el estado si se pierde la conexión
+            socket.onclose = () => {
+                setTimeout(async () => {
+                    await refreshData();
+                    connectUpdates();
+                }, 5000);
+            };
+        }
+        
         function showWorkflowDetails(workflowId) {
             // Implementar modal con detalles del workflow
             alert('Detalles del workflow: ' + workflowId);
@@ -437,120 +493,393 @@ class IntegrationDashboard:
         
         // Inicialización
         document.addEventListener('DOMContentLoaded', async () => {
+            cacheElements();
             await initChart();
             await refreshData();
             
-            // Actualizar datos cada 30 segundos
-            setInterval(refreshData, 30000);
+            // Recibir actualizaciones en tiempo real
+            connectUpdates();
         });
     </script>
 </body>
 </html>
         """
-        return web.Response(text=html_content, content_type='text/html')
+_DASHBOARD_HTML_BYTES = _DASHBOARD_HTML.encode('utf-8')
+_DASHBOARD_HTML_GZ = gzip.compress(_DASHBOARD_HTML_BYTES, 9)
+# Cambia con cada despliegue que modifique el HTML; una variante por codificación
+_DASHBOARD_ETAG = hashlib.blake2b(_DASHBOARD_HTML_BYTES, digest_size=8).hexdigest()
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Indicar si Accept-Encoding admite gzip, respetando los valores q (gzip;q=0 lo rechaza)"""
+    gzip_q = wildcard_q = None
+    for part in accept_encoding.split(','):
+        coding, *params = part.split(';')
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding in ('gzip', 'x-gzip'):
+            gzip_q = q
+        elif coding == '*':
+            wildcard_q = q
+    q = gzip_q if gzip_q is not None else wildcard_q
+    return q is not None and q > 0
+
+class IntegrationDashboard:
+    """Dashboard de monitoreo de integraciones"""
+    
+    def __init__(self):
+        self.app = web.Application(client_max_size=_MAX_REQUEST_BYTES)
+        self.scs_url = os.getenv('SCS_URL', 'http://localhost:23456')
+        self.scs_api_key = os.getenv('SCS_API_KEY')
+        self.n8n_url = os.getenv('N8N_URL', 'http://localhost:5678')
+        self.n8n_api_key = os.getenv('N8N_API_KEY')
+        
+        # Almacenamiento de métricas (las colas descartan los elementos más antiguos)
+        self.integration_metrics: Dict[str, IntegrationMetric] = {}
+        self.workflow_executions: Deque[WorkflowExecution] = deque(maxlen=1000)
+        self.system_events: Deque[Dict[str, Any]] = deque(maxlen=500)
+        
+        # Ejecuciones serializadas una sola vez, en paralelo a workflow_executions
+        self._workflow_chunks: Deque[bytes] = deque(maxlen=1000)
+        self._workflows_version = 0
+        
+        # Contador de workflows del día (UTC), reiniciado a medianoche
+        self._today = datetime.now(_UTC).date()
+        self._workflows_today = 0
+        self._day_rollover: Optional[asyncio.Task] = None
+        
+        # Respuestas JSON ya serializadas (cuerpo, ETag), se descartan al modificar los datos
+        self._json_cache: Dict[str, Tuple[bytes, str]] = {}
+        self._etag_prefix = secrets.token_hex(4)
+        
+        # Clientes WebSocket conectados al dashboard
+        self.ws_clients: Set[web.WebSocketResponse] = set()
+        self._broadcast_tasks: Set[asyncio.Task] = set()
+        
+        # Cola de eventos de webhooks, procesada en lotes por _drain_events
+        self._event_queue: asyncio.Queue = asyncio.Queue()
+        self._event_drainer: Optional[asyncio.Task] = None
+        
+        # Configurar CORS
+        cors = aiohttp_cors.setup(self.app, defaults={
+            "*": aiohttp_cors.ResourceOptions(
+                allow_credentials=True,
+                expose_headers="*",
+                allow_headers="*",
+                allow_methods="*"
+            )
+        })
+        
+        # Configurar rutas
+        self._setup_routes()
+        self._add_cors_routes(cors)
+        
+        # Session HTTP
+        self.session = None
+        
+        # Recursos compartidos ligados al ciclo de vida de la aplicación
+        self.app.on_startup.append(self._on_startup)
+        self.app.on_cleanup.append(self._on_cleanup)
+    
+    def _setup_routes(self):
+        """Configurar rutas del dashboard"""
+        self.app.router.add_get('/', self.serve_dashboard)
+        self.app.router.add_get('/api/status', self.get_system_status)
+        self.app.router.add_get('/api/metrics', self.get_integration_metrics)
+        self.app.router.add_get('/api/workflows', self.get_workflow_executions)
+        self.app.router.add_get('/api/events', self.get_system_events)
+        self.app.router.add_get('/api/snapshot', self.get_snapshot)
+        self.app.router.add_post('/api/webhook', self.handle_webhook)
+        self.app.router.add_get('/ws', self.ws_handler)
+        self.app.router.add_get('/health', self.health_check)
+    
+    def _add_cors_routes(self, cors):
+        """Agregar CORS a todas las rutas"""
+        for route in list(self.app.router.routes()):
+            cors.add(route)
+    
+    async def serve_dashboard(self, request):
+        """Servir HTML del dashboard"""
+        use_gzip = _accepts_gzip(request.headers.get('Accept-Encoding', ''))
+        etag = f'"{_DASHBOARD_ETAG}-gz"' if use_gzip else f'"{_DASHBOARD_ETAG}"'
+        # Sin 'immutable': la URL no está versionada y tras un despliegue hay que revalidar
+        headers = {
+            'Cache-Control': 'public, max-age=300',
+            'Vary': 'Accept-Encoding',
+            'ETag': etag
+        }
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers=headers)
+        if use_gzip:
+            headers['Content-Encoding'] = 'gzip'
+            return web.Response(body=_DASHBOARD_HTML_GZ, headers=headers, content_type='text/html', charset='utf-8')
+        return web.Response(body=_DASHBOARD_HTML_BYTES, headers=headers, content_type='text/html', charset='utf-8')
     
     async def get_system_status(self, request):
         """Obtener estado del sistema"""
         try:
-            # Obtener estado de Shared Context Server
-            scs_status = await self._get_scs_status()
-            
-            # Obtener estado de n8n
-            n8n_status = await self._get_n8n_status()
-            
-            # Calcular métricas agregadas
-            total_integrations = len(self.integration_metrics)
-            connected_integrations = sum(1 for m in self.integration_metrics.values() if m.status == 'connected')
-            
-            return web.json_response({
-                "status": "healthy",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "total_integrations": total_integrations,
-                "connected_integrations": connected_integrations,
-                "integration_health": scs_status,
-                "n8n_status": n8n_status,
-                "workflow_executions": len(self.workflow_executions),
-                "system_events": len(self.system_events)
-            })
+            return _json(await self._system_status())
         except Exception as e:
             logger.error(f"Error obteniendo estado del sistema: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json({"error": str(e)}, status=500)
+    
+    async def get_snapshot(self, request):
+        """Obtener estado, métricas, workflows y eventos en una sola respuesta"""
+        try:
+            status = await self._system_status()
+            metrics, _ = self._cached_body('metrics', lambda: self.integration_metrics)
+            events, _ = self._cached_body('events', self._recent_events)
+            start = max(0, len(self._workflow_chunks) - 50)
+            workflows = b','.join(islice(self._workflow_chunks, start, None))
+            
+            # Reutilizar los cuerpos ya serializados en lugar de volver a codificarlos
+            body = b''.join([
+                b'{"status":', _dumps(status),
+                b',"metrics":', metrics,
+                b',"workflows":[', workflows,
+                b'],"events":', events,
+                b'}'
+            ])
+            return web.Response(body=body, content_type='application/json')
+        except Exception as e:
+            logger.error(f"Error obteniendo snapshot: {e}")
+            return _json({"error": str(e)}, status=500)
+    
+    async def _system_status(self) -> Dict[str, Any]:
+        """Construir el estado del sistema consultando los servicios externos"""
+        # Consultar Shared Context Server y n8n en paralelo
+        scs_status, n8n_status = await asyncio.gather(
+            self._get_scs_status(),
+            self._get_n8n_status(),
+            return_exceptions=True
+        )
+        if isinstance(scs_status, Exception):
+            scs_status = {"status": "error", "error": str(scs_status)}
+        if isinstance(n8n_status, Exception):
+            n8n_status = {"status": "error", "error": str(n8n_status)}
+        
+        # Calcular métricas agregadas
+        summary = self._summary()
+        
+        return {
+            "status": "healthy",
+            "timestamp": _now_iso(),
+            "total_integrations": len(self.integration_metrics),
+            "connected_integrations": summary["active"],
+            "integration_health": scs_status,
+            "n8n_status": n8n_status,
+            "workflow_executions": len(self.workflow_executions),
+            "system_events": len(self.system_events),
+            "summary": summary
+        }
+    
+    def _summary(self) -> Dict[str, Any]:
+        """Calcular los indicadores principales que muestra el dashboard"""
+        active = total_requests = total_errors = 0
+        total_response_time = total_success_rate = 0.0
+        for metric in self.integration_metrics.values():
+            if metric.status == 'connected':
+                active += 1
+            total_requests += metric.total_requests
+            total_errors += metric.error_count
+            total_response_time += metric.response_time
+            total_success_rate += metric.success_rate
+        
+        count = len(self.integration_metrics)
+        if total_requests > 0:
+            success_rate = (total_requests - total_errors) / total_requests * 100
+        else:
+            success_rate = total_success_rate / count if count else 0.0
+        
+        return {
+            "active": active,
+            "workflows_today": self._workflows_today,
+            "success_rate": round(success_rate, 1),
+            "avg_response_time": round(total_response_time / count) if count else 0
+        }
     
     async def get_integration_metrics(self, request):
         """Obtener métricas de integraciones"""
         try:
-            metrics_dict = {}
-            for service, metric in self.integration_metrics.items():
-                metrics_dict[service] = {
-                    **asdict(metric),
-                    "last_success": metric.last_success.isoformat() if metric.last_success else None,
-                    "last_error": metric.last_error.isoformat() if metric.last_error else None
-                }
-            
-            return web.json_response(metrics_dict)
+            return self._cached_json(request, 'metrics', lambda: self.integration_metrics)
         except Exception as e:
             logger.error(f"Error obteniendo métricas: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json({"error": str(e)}, status=500)
+    
+    def _cached_body(self, key: str, build) -> Tuple[bytes, str]:
+        """Obtener el JSON cacheado y su ETag, regenerándolos solo si cambiaron"""
+        cached = self._json_cache.get(key)
+        if cached is None:
+            body = _dumps(build())
+            etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+            cached = self._json_cache[key] = (body, etag)
+        return cached
+    
+    def _cached_json(self, request, key: str, build) -> web.Response:
+        """Responder con el JSON cacheado, o 304 si el cliente ya lo tiene"""
+        body, etag = self._cached_body(key, build)
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(
+            body=body,
+            headers={'ETag': etag, 'Cache-Control': 'no-cache'},
+            content_type='application/json'
+        )
+    
+    def _invalidate(self, *keys: str):
+        """Marcar respuestas cacheadas como obsoletas"""
+        for key in keys:
+            self._json_cache.pop(key, None)
+    
+    def _recent_events(self) -> List[Dict[str, Any]]:
+        """Obtener los últimos 100 eventos del sistema"""
+        start = max(0, len(self.system_events) - 100)
+        return list(islice(self.system_events, start, None))
     
     async def get_workflow_executions(self, request):
         """Obtener ejecuciones de workflows"""
-        try:
-            executions = []
-            for execution in self.workflow_executions[-50:]:  # Últimas 50 ejecuciones
-                executions.append({
-                    **asdict(execution),
-                    "start_time": execution.start_time.isoformat(),
-                    "end_time": execution.end_time.isoformat()
-                })
-            
-            return web.json_response(executions)
-        except Exception as e:
-            logger.error(f"Error obteniendo ejecuciones: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+        # Tomar versión y fragmentos en el mismo instante, antes de cualquier await:
+        # una ejecución añadida mientras se escribe no debe mutar el deque que recorremos
+        etag = f'"{self._etag_prefix}-{self._workflows_version}"'
+        start = max(0, len(self._workflow_chunks) - 50)
+        chunks = list(islice(self._workflow_chunks, start, None))
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers={'ETag': etag})
+        
+        # Enviar las últimas 50 ejecuciones ya serializadas sin construir el cuerpo completo
+        response = web.StreamResponse(headers={'ETag': etag, 'Cache-Control': 'no-cache'})
+        response.content_type = 'application/json'
+        await response.prepare(request)
+        
+        await response.write(b'[')
+        for i, chunk in enumerate(chunks):
+            await response.write(b',' + chunk if i else chunk)
+        await response.write(b']')
+        
+        await response.write_eof()
+        return response
     
     async def get_system_events(self, request):
         """Obtener eventos del sistema"""
         try:
-            return web.json_response(self.system_events[-100:])  # Últimos 100 eventos
+            return self._cached_json(request, 'events', self._recent_events)
         except Exception as e:
             logger.error(f"Error obteniendo eventos: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json({"error": str(e)}, status=500)
     
     async def handle_webhook(self, request):
         """Manejar webhooks de integraciones"""
+        if request.content_length and request.content_length > _MAX_REQUEST_BYTES:
+            return _json({"error": "Payload demasiado grande"}, status=413)
+        
         try:
-            data = await request.json()
+            raw = await request.read()
+            try:
+                data = _loads(raw)
+            except ValueError:
+                return _json({"error": "JSON inválido"}, status=400)
+            if not isinstance(data, dict):
+                return _json({"error": "Se esperaba un objeto JSON"}, status=400)
             
             # Procesar webhook según el tipo
             webhook_type = data.get('type', 'unknown')
             
+            # Ignorar los heartbeats para no llenar el historial de eventos
+            if webhook_type == 'heartbeat':
+                return _json({"success": True})
+            
             # Agregar evento del sistema
-            self.system_events.append({
+            event = {
                 "type": "webhook_received",
                 "source": webhook_type,
                 "message": f"Webhook recibido de {webhook_type}",
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "timestamp": _now_iso(),
                 "data": data
-            ])
-            
-            # Mantener solo los últimos 500 eventos
-            if len(self.system_events) > 500:
-                self.system_events = self.system_events[-500:]
+            }
+            await self._event_queue.put(event)
             
-            return web.json_response({"success": True})
+            return _json({"success": True})
+        except web.HTTPRequestEntityTooLarge:
+            return _json({"error": "Payload demasiado grande"}, status=413)
         except Exception as e:
             logger.error(f"Error procesando webhook: {e}")
-            return web.json_response({"error": str(e)}, status=500)
+            return _json({"error": str(e)}, status=500)
+    
+    async def _drain_events(self):
+        """Consumir eventos de webhooks en lotes y publicarlos juntos"""
+        while True:
+            batch = [await self._event_queue.get()]
+            while not self._event_queue.empty() and len(batch) < 64:
+                batch.append(self._event_queue.get_nowait())
+            
+            self.system_events.extend(batch)
+            self._invalidate('events')
+            self._push("events", batch)
+    
+    async def _rollover_daily(self):
+        """Reiniciar el contador de workflows del día en cada medianoche UTC"""
+        while True:
+            now = datetime.now(_UTC)
+            midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), _UTC)
+            await asyncio.sleep((midnight - now).total_seconds())
+            
+            self._today = datetime.now(_UTC).date()
+            self._workflows_today = 0
+            self._push("summary", self._summary())
+    
+    async def ws_handler(self, request):
+        """Canal WebSocket para enviar actualizaciones a los clientes del dashboard"""
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        
+        self.ws_clients.add(ws)
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.ERROR:
+                    logger.warning(f"Conexión WebSocket cerrada con error: {ws.exception()}")
+        finally:
+            self.ws_clients.discard(ws)
+        
+        return ws
+    
+    async def _broadcast(self, message: Dict[str, Any]):
+        """Enviar un mensaje a todos los clientes WebSocket conectados"""
+        data = _dumps(message).decode('utf-8')
+        for ws in list(self.ws_clients):
+            if ws.closed:
+                self.ws_clients.discard(ws)
+                continue
+            try:
+                await ws.send_str(data)
+            except (ConnectionResetError, RuntimeError) as e:
+                logger.warning(f"Error enviando actualización WebSocket: {e}")
+                self.ws_clients.discard(ws)
+    
+    def _push(self, message_type: str, payload: Any):
+        """Programar el envío de una actualización sin bloquear al llamador"""
+        if not self.ws_clients:
+            return
+        
+        task = asyncio.create_task(self._broadcast({"type": message_type, "payload": payload}))
+        self._broadcast_tasks.add(task)
+        task.add_done_callback(self._broadcast_tasks.discard)
     
     async def health_check(self, request):
         """Health check endpoint"""
-        return web.json_response({
+        return _json({
             "status": "healthy",
-            "timestamp": datetime.now(timezone.utc).isoformat()
+            "timestamp": _now_iso()
         })
     
     async def _get_scs_status(self):
         """Obtener estado de Shared Context Server"""
+        assert self.session is not None, "El dashboard no ha sido iniciado"
         try:
             async with self.session.get(
                 f"{self.scs_url}/health",
@@ -565,6 +894,7 @@ class IntegrationDashboard:
     
     async def _get_n8n_status(self):
         """Obtener estado de n8n"""
+        assert self.session is not None, "El dashboard no ha sido iniciado"
         try:
             async with self.session.get(
                 f"{self.n8n_url}/rest/active",
@@ -583,24 +913,47 @@ class IntegrationDashboard:
     
     def add_system_event(self, event_type: str, message: str, data: Dict[str, Any] = None):
         """Agregar evento del sistema"""
-        self.system_events.append({
+        event = {
             "type": event_type,
             "message": message,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": _now_iso(),
             "data": data or {}
-        })
+        }
+        self.system_events.append(event)
+        self._invalidate('events')
         
-        # Mantener solo los últimos 500 eventos
-        if len(self.system_events) > 500:
-            self.system_events = self.system_events[-500:]
+        self._push("events", [event])
+    
+    def publish_metrics(self):
+        """Notificar cambios en las métricas a los clientes conectados"""
+        self._invalidate('metrics')
+        self._push("metrics", self.integration_metrics)
+        self._push("summary", self._summary())
+    
+    def simulate_metric_drift(self):
+        """Simular pequeñas variaciones en las métricas y notificarlas"""
+        uniform = random.uniform
+        for metric in self.integration_metrics.values():
+            metric.response_time = max(10, metric.response_time + uniform(-5, 5))
+            metric.success_rate = max(90, min(100, metric.success_rate + uniform(-1, 1)))
+        
+        self.publish_metrics()
     
     def add_workflow_execution(self, execution: WorkflowExecution):
         """Agregar ejecución de workflow"""
         self.workflow_executions.append(execution)
+        self._workflow_chunks.append(_dumps(execution))
+        self._workflows_version += 1
         
-        # Mantener solo las últimas 1000 ejecuciones
-        if len(self.workflow_executions) > 1000:
-            self.workflow_executions = self.workflow_executions[-1000:]
+        # Comparar en UTC (las fechas sin zona se asumen UTC); solo _rollover_daily avanza _today
+        start_time = execution.start_time
+        if start_time.tzinfo is None:
+            start_time = start_time.replace(tzinfo=_UTC)
+        if start_time.astimezone(_UTC).date() == self._today:
+            self._workflows_today += 1
+        
+        self._push("workflow", execution)
+        self._push("summary", self._summary())
         
         # Agregar evento del sistema
         self.add_system_event(
@@ -613,14 +966,40 @@ class IntegrationDashboard:
             }
         )
     
-    async def start(self):
-        """Iniciar el dashboard"""
-        self.session = aiohttp.ClientSession()
+    async def _on_startup(self, app: web.Application):
+        """Crear la sesión HTTP e inicializar métricas al arrancar la aplicación"""
+        # Sesión HTTP compartida con pool de conexiones acotado
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=32,
+            ttl_dns_cache=300,
+            keepalive_timeout=75
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=5)
+        )
         
         # Inicializar métricas básicas
         await self._initialize_metrics()
         
-        runner = web.AppRunner(self.app)
+        # Procesar eventos de webhooks en segundo plano
+        self._event_drainer = asyncio.create_task(self._drain_events())
+        self._day_rollover = asyncio.create_task(self._rollover_daily())
+    
+    async def _on_cleanup(self, app: web.Application):
+        """Liberar recursos al detener la aplicación"""
+        await self.stop()
+    
+    async def start(self):
+        """Iniciar el dashboard"""
+        # Conexiones keep-alive largas y sin access log en el camino de cada petición
+        runner = web.AppRunner(
+            self.app,
+            keepalive_timeout=120,
+            tcp_keepalive=True,
+            access_log=None
+        )
         await runner.setup()
         
         site = web.TCPSite(runner, '0.0.0.0', 8080)
@@ -643,18 +1022,39 @@ class IntegrationDashboard:
                 status='unknown',
                 response_time=0.0,
                 success_rate=100.0,
-                last_success=datetime.now(timezone.utc),
-                last_error=datetime.now(timezone.utc),
+                last_success=datetime.now(_UTC),
+                last_error=datetime.now(_UTC),
                 total_requests=0,
                 error_count=0,
                 uptime_percentage=100.0
             )
+        
+        self._invalidate('metrics')
     
     async def stop(self):
         """Detener el dashboard"""
+        for task in (self._event_drainer, self._day_rollover):
+            if task:
+                task.cancel()
+        self._event_drainer = self._day_rollover = None
+        
         if self.session:
             await self.session.close()
-        logger.info("🛑 Dashboard detenido")
+            self.session = None
+            # Dar tiempo a que se cierren los transportes TLS
+            await asyncio.sleep(0.25)
+            logger.info("🛑 Dashboard detenido")
+
+async def make_app() -> web.Application:
+    """
+    Fábrica de la aplicación para ejecutar el dashboard con varios procesos:
+
+        gunicorn dashboard:make_app --chdir src -k aiohttp.GunicornWebWorker -w 4 -b 0.0.0.0:8080
+
+    Cada worker mantiene su propio estado en memoria (eventos, workflows y
+    clientes WebSocket).
+    """
+    return IntegrationDashboard().app
 
 async def main():
     """Función principal"""
@@ -668,11 +1068,7 @@ async def main():
             await asyncio.sleep(60)
             
             # Simular actualización de métricas
-            for service, metric in dashboard.integration_metrics.items():
-                # Simular pequeñas variaciones en las métricas
-                import random
-                metric.response_time = max(10, metric.response_time + random.uniform(-5, 5))
-                metric.success_rate = max(90, min(100, metric.success_rate + random.uniform(-1, 1)))
+            dashboard.simulate_metric_drift()
         
     except KeyboardInterrupt:
         logger.info("🛑 Recibida señal de interrupción")
@@ -682,4 +1078,7 @@ async def main():
         await dashboard.stop()
 
 if __name__ == "__main__":
+    # Usar el event loop de uvloop si está instalado
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())
\ No newline at end of file
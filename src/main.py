@@ -6,11 +6,13 @@ Shared Context Server como base para automatización inteligente.
 """
 
 import asyncio
+import hashlib
 import logging
 import os
+import signal
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import json
 
 # Importaciones de MCP
@@ -18,6 +20,21 @@ import aiohttp
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+try:
+    import aiodns
+except ImportError:
+    aiodns = None
+
 # Configuración de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -25,13 +42,101 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@dataclass
+def _json_default(obj: Any) -> Any:
+    """Convertir fechas para el encoder estándar de json"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _dumps(obj: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """Serializar a JSON usando orjson si está disponible"""
+    if orjson is not None:
+        option = orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_DATACLASS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option)
+    # Formato compacto, como orjson (no garantiza bytes idénticos: p. ej. floats)
+    return json.dumps(
+        obj,
+        indent=2 if indent else None,
+        separators=None if indent else (',', ':'),
+        sort_keys=sort_keys,
+        ensure_ascii=False,
+        default=_json_default
+    ).encode('utf-8')
+
+def _loads(raw: Any) -> Any:
+    """Deserializar JSON usando orjson si está disponible"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+# Intervalo de health checks: se duplica mientras todo esté sano, hasta el máximo
+HEALTH_CHECK_INTERVAL = 60
+HEALTH_CHECK_MAX_INTERVAL = 300
+# Tras un fallo se vuelve a comprobar enseguida; si persiste, se usa el intervalo base
+HEALTH_CHECK_RETRY_DELAY = 5
+
+# Plantilla del cuerpo de los issues generados desde email
+_ISSUE_TEMPLATE = """**Issue generado desde email**
+
+**De:** {sender}
+**Asunto:** {subject}
+**Fecha:** {date}
+
+---
+
+**Contenido del email:**
+{body}
+
+---
+
+**Análisis automático:**
+```json
+{analysis_json}
+```
+
+---
+
+🤖 *Este issue fue creado automáticamente por el Enterprise Integration Hub*
+"""
+
+# APIs externas opcionales y las variables de entorno que requiere cada una
+_APIS = (
+    ("slack", ("SLACK_BOT_TOKEN",)),
+    ("jira", ("JIRA_API_TOKEN", "JIRA_URL")),
+    ("salesforce", ("SALESFORCE_CLIENT_ID",)),
+)
+
+# Repositorio por defecto donde se crean los issues (esto se puede configurar)
+_ISSUES_REPO = "omanzanodev/enterprise-integration-hub"
+
+@dataclass(slots=True)
 class IntegrationStatus:
     """Estado de una integración"""
     service: str
     status: str  # 'connected', 'disconnected', 'error'
     last_check: datetime
     metrics: Dict[str, Any]
+    _view: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
+    
+    def update(self, status: str, last_check: datetime):
+        """Actualizar estado e invalidar la vista serializada"""
+        self.status = status
+        self.last_check = last_check
+        self._view = None
+    
+    def view(self) -> Dict[str, Any]:
+        """Vista serializable, cacheada hasta la próxima actualización"""
+        if self._view is None:
+            self._view = {
+                "status": self.status,
+                "last_check": self.last_check.isoformat(),
+                "metrics": self.metrics
+            }
+        return self._view
 
 class EnterpriseIntegrationHub:
     """Clase principal del Hub de Integración Empresarial"""
@@ -41,42 +146,118 @@ class EnterpriseIntegrationHub:
         self.scs_api_key = os.getenv('SCS_API_KEY')
         self.n8n_url = os.getenv('N8N_URL', 'http://localhost:5678')
         self.n8n_api_key = os.getenv('N8N_API_KEY')
+        self.github_token = os.getenv('GITHUB_TOKEN')
+        self.github_url = os.getenv('GITHUB_ENTERPRISE_URL', 'https://github.com')
         
         # Estados de integraciones
         self.integrations: Dict[str, IntegrationStatus] = {}
+        self._connected_count = 0
         self.session = None
+        self._resolver = None
         self.mcp_session = None
         
-        # Headers para API calls
-        self.scs_headers = {
-            'X-API-Key': self.scs_api_key,
-            'Content-Type': 'application/json'
-        }
+        # Sesiones SCS ya creadas, por (propósito, metadata); evita recrearlas al reconectar
+        self._scs_session_cache: Dict[tuple, Dict[str, Any]] = {}
         
-        self.n8n_headers = {
-            'X-N8N-API-KEY': self.n8n_api_key,
-            'Content-Type': 'application/json'
-        }
+        # Tareas en segundo plano (notificaciones); se guardan para que no las recoja el GC
+        self._bg_tasks: set = set()
+        
+        # Control del bucle principal
+        self._shutdown_event = asyncio.Event()
+        self._next_interval = HEALTH_CHECK_INTERVAL
+        self._failing = False
+        
+        # Headers para API calls (Content-Type ya lo fija la sesión HTTP)
+        self.scs_headers = {'X-API-Key': self.scs_api_key}
+        self.n8n_headers = {'X-N8N-API-KEY': self.n8n_api_key}
+        
+        self.github_headers = {
+            'Authorization': f'token {self.github_token}',
+            'Accept': 'application/vnd.github+json'
+        } if self.github_token else None
     
     async def initialize(self):
         """Inicializar todas las conexiones"""
         logger.info("🚀 Inicializando Enterprise Integration Hub")
         
-        # Crear sesión HTTP
-        self.session = aiohttp.ClientSession()
+        # Apagado limpio al recibir SIGTERM/SIGINT
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self._shutdown_event.set)
+            except NotImplementedError:
+                # Windows no soporta add_signal_handler
+                pass
+        
+        # Crear sesión HTTP compartida con pool de conexiones y caché DNS
+        # (resolución asíncrona con aiodns si está instalado; el conector no cierra
+        # un resolver recibido, así que se guarda para cerrarlo en shutdown())
+        self._resolver = aiohttp.AsyncResolver() if aiodns is not None else None
+        connector = aiohttp.TCPConnector(
+            resolver=self._resolver,
+            limit=100,
+            limit_per_host=20,
+            ttl_dns_cache=300,
+            keepalive_timeout=75,
+            enable_cleanup_closed=True
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=30),
+            headers={'Content-Type': 'application/json'}
+        )
+        
+        # Marca de tiempo común para esta pasada de inicialización
+        now = self._utcnow()
         
         # Conectar a Shared Context Server
-        await self._connect_scs()
+        await self._connect_scs(now)
         
         # Inicializar integraciones
-        await self._initialize_integrations()
+        await self._initialize_integrations(now)
         
-        # Verificar estado de todos los servicios
-        await self._health_check_all()
+        # Resumen inicial: los _init_* acaban de fijar todos los estados, no volver a sondear
+        await self._health_check_all(probe=False)
         
         logger.info("✅ Enterprise Integration Hub inicializado correctamente")
     
-    async def _connect_scs(self):
+    def _set_status(self, key: str, service: str, status: str, now: datetime, metrics: Dict[str, Any]):
+        """Registrar el estado de una integración manteniendo el contador de conectadas"""
+        previous = self.integrations.get(key)
+        self._connected_count += (status == 'connected') - (previous is not None and previous.status == 'connected')
+        self.integrations[key] = IntegrationStatus(
+            service=service,
+            status=status,
+            last_check=now,
+            metrics=metrics
+        )
+    
+    def _update_status(self, key: str, status: str, now: datetime, error: Optional[str] = None):
+        """Actualizar el estado de una integración existente manteniendo el contador"""
+        integration = self.integrations[key]
+        self._connected_count += (status == 'connected') - (integration.status == 'connected')
+        
+        # El error solo figura en las métricas mientras la integración siga fallando
+        if error is not None or 'error' in integration.metrics:
+            metrics = {k: v for k, v in integration.metrics.items() if k != 'error'}
+            if error is not None:
+                metrics['error'] = error
+            integration.metrics = metrics
+        
+        integration.update(status, now)
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        """Lanzar una tarea en segundo plano manteniendo una referencia hasta que termine"""
+        task = asyncio.create_task(coro)
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+        return task
+    
+    def _utcnow(self) -> datetime:
+        """Fecha y hora actual en UTC"""
+        return datetime.now(timezone.utc)
+    
+    async def _connect_scs(self, now: datetime):
         """Conectar a Shared Context Server"""
         try:
             async with self.session.get(
@@ -84,45 +265,44 @@ class EnterpriseIntegrationHub:
                 headers=self.scs_headers
             ) as response:
                 if response.status == 200:
-                    data = await response.json()
-                    logger.info(f"✅ Conectado a Shared Context Server: {data.get('status', 'healthy')}")
-                    self.integrations['shared-context-server'] = IntegrationStatus(
-                        service='Shared Context Server',
-                        status='connected',
-                        last_check=datetime.now(timezone.utc),
-                        metrics=data
+                    # Solo interesa el estado; no retener el resto del payload de salud
+                    scs_status = _loads(await response.read()).get('status', 'healthy')
+                    logger.info("✅ Conectado a Shared Context Server: %s", scs_status)
+                    self._set_status(
+                        'shared-context-server', 'Shared Context Server', 'connected', now,
+                        {'status': scs_status}
                     )
                 else:
                     raise Exception(f"Status code: {response.status}")
         except Exception as e:
-            logger.error(f"❌ Error conectando a Shared Context Server: {e}")
-            self.integrations['shared-context-server'] = IntegrationStatus(
-                service='Shared Context Server',
-                status='error',
-                last_check=datetime.now(timezone.utc),
-                metrics={'error': str(e)}
+            logger.error("❌ Error conectando a Shared Context Server: %s", e)
+            self._set_status(
+                'shared-context-server', 'Shared Context Server', 'error', now,
+                {'error': str(e)}
             )
     
-    async def _initialize_integrations(self):
+    async def _initialize_integrations(self, now: datetime):
         """Inicializar todas las integraciones"""
         logger.info("🔌 Inicializando integraciones empresariales...")
         
-        # Microsoft 365
-        await self._init_microsoft365()
-        
-        # GitHub Enterprise
-        await self._init_github_enterprise()
-        
-        # Notion
-        await self._init_notion()
-        
-        # n8n Workflows
-        await self._init_n8n()
+        # Las integraciones son independientes: inicializarlas en paralelo
+        initializers = {
+            'microsoft365': self._init_microsoft365,
+            'github': self._init_github_enterprise,
+            'notion': self._init_notion,
+            'n8n': self._init_n8n,
+            'external_apis': self._init_external_apis,
+        }
+        results = await asyncio.gather(
+            *(init(now) for init in initializers.values()),
+            return_exceptions=True
+        )
         
-        # APIs Externas
-        await self._init_external_apis()
+        for service_name, result in zip(initializers, results):
+            if isinstance(result, Exception):
+                logger.error("❌ Error inesperado inicializando %s: %s", service_name, result)
     
-    async def _init_microsoft365(self):
+    async def _init_microsoft365(self, now: datetime):
         """Inicializar integración con Microsoft 365"""
         try:
             # Verificar credenciales de Microsoft 365
@@ -138,48 +318,39 @@ class EnterpriseIntegrationHub:
                     metadata={"service": "microsoft365", "tenant": tenant_id}
                 )
                 
-                self.integrations['microsoft365'] = IntegrationStatus(
-                    service='Microsoft 365',
-                    status='connected',
-                    last_check=datetime.now(timezone.utc),
-                    metrics={'session_id': session_data.get('session_id'), 'tenant': tenant_id}
+                self._set_status(
+                    'microsoft365', 'Microsoft 365', 'connected', now,
+                    {'session_id': session_data.get('session_id'), 'tenant': tenant_id}
                 )
                 
                 logger.info("✅ Microsoft 365 inicializado correctamente")
             else:
                 logger.warning("⚠️ Credenciales de Microsoft 365 no configuradas")
-                self.integrations['microsoft365'] = IntegrationStatus(
-                    service='Microsoft 365',
-                    status='disconnected',
-                    last_check=datetime.now(timezone.utc),
-                    metrics={'error': 'credentials_not_configured'}
+                self._set_status(
+                    'microsoft365', 'Microsoft 365', 'disconnected', now,
+                    {'error': 'credentials_not_configured'}
                 )
         except Exception as e:
-            logger.error(f"❌ Error inicializando Microsoft 365: {e}")
-            self.integrations['microsoft365'] = IntegrationStatus(
-                service='Microsoft 365',
-                status='error',
-                last_check=datetime.now(timezone.utc),
-                metrics={'error': str(e)}
+            logger.error("❌ Error inicializando Microsoft 365: %s", e)
+            self._set_status(
+                'microsoft365', 'Microsoft 365', 'error', now,
+                {'error': str(e)}
             )
     
-    async def _init_github_enterprise(self):
+    async def _init_github_enterprise(self, now: datetime):
         """Inicializar integración con GitHub Enterprise"""
         try:
-            github_token = os.getenv('GITHUB_TOKEN')
-            github_url = os.getenv('GITHUB_ENTERPRISE_URL', 'https://github.com')
-            
-            if github_token:
+            if self.github_headers:
                 logger.info("🐙 Inicializando GitHub Enterprise integration...")
                 
                 # Verificar conexión a GitHub
                 async with self.session.get(
-                    f"{github_url}/user",
-                    headers={'Authorization': f'token {github_token}'}
+                    f"{self.github_url}/user",
+                    headers=self.github_headers
                 ) as response:
                     if response.status == 200:
-                        user_data = await response.json()
-                        logger.info(f"✅ Conectado a GitHub como: {user_data.get('login', 'unknown')}")
+                        user_data = await response.json(loads=_loads)
+                        logger.info("✅ Conectado a GitHub como: %s", user_data.get('login', 'unknown'))
                         
                         # Crear sesión en SCS para GitHub
                         session_data = await self._create_scs_session(
@@ -187,40 +358,34 @@ class EnterpriseIntegrationHub:
                             metadata={
                                 "service": "github", 
                                 "user": user_data.get('login'),
-                                "enterprise_url": github_url
+                                "enterprise_url": self.github_url
                             }
                         )
                         
-                        self.integrations['github'] = IntegrationStatus(
-                            service='GitHub Enterprise',
-                            status='connected',
-                            last_check=datetime.now(timezone.utc),
-                            metrics={
+                        self._set_status(
+                            'github', 'GitHub Enterprise', 'connected', now,
+                            {
                                 'session_id': session_data.get('session_id'),
                                 'user': user_data.get('login'),
-                                'enterprise_url': github_url
+                                'enterprise_url': self.github_url
                             }
                         )
                     else:
                         raise Exception(f"GitHub API error: {response.status}")
             else:
                 logger.warning("⚠️ Token de GitHub no configurado")
-                self.integrations['github'] = IntegrationStatus(
-                    service='GitHub Enterprise',
-                    status='disconnected',
-                    last_check=datetime.now(timezone.utc),
-                    metrics={'error': 'token_not_configured'}
+                self._set_status(
+                    'github', 'GitHub Enterprise', 'disconnected', now,
+                    {'error': 'token_not_configured'}
                 )
         except Exception as e:
-            logger.error(f"❌ Error inicializando GitHub Enterprise: {e}")
-            self.integrations['github'] = IntegrationStatus(
-                service='GitHub Enterprise',
-                status='error',
-                last_check=datetime.now(timezone.utc),
-                metrics={'error': str(e)}
+            logger.error("❌ Error inicializando GitHub Enterprise: %s", e)
+            self._set_status(
+                'github', 'GitHub Enterprise', 'error', now,
+                {'error': str(e)}
             )
     
-    async def _init_notion(self):
+    async def _init_notion(self, now: datetime):
         """Inicializar integración con Notion"""
         try:
             notion_token = os.getenv('NOTION_TOKEN')
@@ -238,11 +403,9 @@ class EnterpriseIntegrationHub:
                     }
                 )
                 
-                self.integrations['notion'] = IntegrationStatus(
-                    service='Notion',
-                    status='connected',
-                    last_check=datetime.now(timezone.utc),
-                    metrics={
+                self._set_status(
+                    'notion', 'Notion', 'connected', now,
+                    {
                         'session_id': session_data.get('session_id'),
                         'database_id': database_id
                     }
@@ -251,22 +414,18 @@ class EnterpriseIntegrationHub:
                 logger.info("✅ Notion inicializado correctamente")
             else:
                 logger.warning("⚠️ Credenciales de Notion no configuradas")
-                self.integrations['notion'] = IntegrationStatus(
-                    service='Notion',
-                    status='disconnected',
-                    last_check=datetime.now(timezone.utc),
-                    metrics={'error': 'credentials_not_configured'}
+                self._set_status(
+                    'notion', 'Notion', 'disconnected', now,
+                    {'error': 'credentials_not_configured'}
                 )
         except Exception as e:
-            logger.error(f"❌ Error inicializando Notion: {e}")
-            self.integrations['notion'] = IntegrationStatus(
-                service='Notion',
-                status='error',
-                last_check=datetime.now(timezone.utc),
-                metrics={'error': str(e)}
+            logger.error("❌ Error inicializando Notion: %s", e)
+            self._set_status(
+                'notion', 'Notion', 'error', now,
+                {'error': str(e)}
             )
     
-    async def _init_n8n(self):
+    async def _init_n8n(self, now: datetime):
         """Inicializar integración con n8n"""
         try:
             async with self.session.get(
@@ -274,58 +433,48 @@ class EnterpriseIntegrationHub:
                 headers=self.n8n_headers
             ) as response:
                 if response.status == 200:
-                    workflows = await response.json()
-                    logger.info(f"🔄 Conectado a n8n - {len(workflows.get('data', []))} workflows activos")
+                    # Solo se necesita el número de workflows activos
+                    active_workflows = len(_loads(await response.read()).get('data', []))
+                    logger.info("🔄 Conectado a n8n - %d workflows activos", active_workflows)
                     
-                    self.integrations['n8n'] = IntegrationStatus(
-                        service='n8n Workflows',
-                        status='connected',
-                        last_check=datetime.now(timezone.utc),
-                        metrics={
-                            'active_workflows': len(workflows.get('data', [])),
+                    self._set_status(
+                        'n8n', 'n8n Workflows', 'connected', now,
+                        {
+                            'active_workflows': active_workflows,
                             'url': self.n8n_url
                         }
                     )
                 else:
                     raise Exception(f"n8n API error: {response.status}")
         except Exception as e:
-            logger.error(f"❌ Error inicializando n8n: {e}")
-            self.integrations['n8n'] = IntegrationStatus(
-                service='n8n Workflows',
-                status='error',
-                last_check=datetime.now(timezone.utc),
-                metrics={'error': str(e)}
+            logger.error("❌ Error inicializando n8n: %s", e)
+            self._set_status(
+                'n8n', 'n8n Workflows', 'error', now,
+                {'error': str(e)}
             )
     
-    async def _init_external_apis(self):
+    async def _init_external_apis(self, now: datetime):
         """Inicializar integración con APIs externas"""
         logger.info("🔗 Inicializando APIs externas...")
         
-        external_apis = {}
-        
-        # Slack
-        if os.getenv('SLACK_BOT_TOKEN'):
-            external_apis['slack'] = {'status': 'configured'}
-        
-        # Jira
-        if os.getenv('JIRA_API_TOKEN') and os.getenv('JIRA_URL'):
-            external_apis['jira'] = {'status': 'configured'}
-        
-        # Salesforce
-        if os.getenv('SALESFORCE_CLIENT_ID'):
-            external_apis['salesforce'] = {'status': 'configured'}
+        configured = [name for name, env_vars in _APIS if all(os.environ.get(v) for v in env_vars)]
         
-        self.integrations['external_apis'] = IntegrationStatus(
-            service='External APIs',
-            status='connected' if external_apis else 'disconnected',
-            last_check=datetime.now(timezone.utc),
-            metrics={'configured_apis': list(external_apis.keys())}
+        self._set_status(
+            'external_apis', 'External APIs', 'connected' if configured else 'disconnected', now,
+            {'configured_apis': configured}
         )
         
-        logger.info(f"✅ APIs externas configuradas: {list(external_apis.keys())}")
+        logger.info("✅ APIs externas configuradas: %s", configured)
     
     async def _create_scs_session(self, purpose: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
-        """Crear sesión en Shared Context Server"""
+        """Crear sesión en Shared Context Server (reutiliza la existente si ya se creó)"""
+        key = (purpose, tuple(sorted(
+            (k, _dumps(v, sort_keys=True)) for k, v in metadata.items()
+        )))
+        cached = self._scs_session_cache.get(key)
+        if cached is not None:
+            return cached
+        
         try:
             session_payload = {
                 "purpose": purpose,
@@ -335,31 +484,98 @@ class EnterpriseIntegrationHub:
             
             async with self.session.post(
                 f"{self.scs_url}/api/sessions",
-                json=session_payload,
+                data=_dumps(session_payload),
                 headers=self.scs_headers
             ) as response:
                 if response.status == 200:
-                    return await response.json()
+                    session_data = await response.json(loads=_loads)
+                    self._scs_session_cache[key] = session_data
+                    return session_data
                 else:
                     raise Exception(f"SCS API error: {response.status}")
         except Exception as e:
-            logger.error(f"❌ Error creando sesión SCS: {e}")
+            logger.error("❌ Error creando sesión SCS: %s", e)
             return {}
     
-    async def _health_check_all(self):
-        """Verificar estado de todas las integraciones"""
+    async def _health_check_all(self, probe: bool = True):
+        """Verificar estado de todas las integraciones (sin sondear si probe=False)"""
         logger.info("🏥 Verificando salud de todas las integraciones...")
         
-        for service_name, integration in self.integrations.items():
-            if integration.status == 'connected':
-                logger.info(f"✅ {service_name}: {integration.status}")
-            else:
-                logger.warning(f"⚠️ {service_name}: {integration.status}")
+        if probe:
+            # Sondear todos los servicios en paralelo; uno lento no bloquea al resto
+            names = list(self.integrations)
+            results = await asyncio.gather(
+                *(asyncio.wait_for(self._probe(name), timeout=5) for name in names),
+                return_exceptions=True
+            )
+            
+            now = self._utcnow()
+            for name, result in zip(names, results):
+                if result is None:
+                    continue
+                if isinstance(result, Exception):
+                    self._update_status(name, 'error', now, error=str(result) or type(result).__name__)
+                    if name == 'shared-context-server':
+                        # Un SCS caído puede volver sin las sesiones creadas: no reutilizarlas
+                        self._scs_session_cache.clear()
+                else:
+                    self._update_status(name, result, now)
         
-        connected_count = sum(1 for i in self.integrations.values() if i.status == 'connected')
+        connected_count = self._connected_count
         total_count = len(self.integrations)
         
-        logger.info(f"📊 Resumen: {connected_count}/{total_count} integraciones conectadas")
+        # Un único registro por pasada en lugar de una línea por integración
+        if logger.isEnabledFor(logging.INFO):
+            lines = [
+                f"  {'✅' if i.status == 'connected' else '⚠️'} {name}: {i.status}"
+                for name, i in self.integrations.items()
+            ]
+            logger.info(
+                "🏥 Estado de integraciones:\n%s\n📊 Resumen: %d/%d integraciones conectadas",
+                "\n".join(lines), connected_count, total_count
+            )
+        
+        # Sano = ninguna integración en error; las no configuradas ('disconnected') no cuentan
+        return all(i.status != 'error' for i in self.integrations.values())
+    
+    async def _probe(self, name: str) -> Optional[str]:
+        """Sondear el endpoint de salud de un servicio (None si no tiene uno)"""
+        if name == 'shared-context-server':
+            url, headers = f"{self.scs_url}/health", self.scs_headers
+        elif name == 'github' and self.github_headers:
+            url, headers = f"{self.github_url}/user", self.github_headers
+        elif name == 'n8n':
+            url, headers = f"{self.n8n_url}/rest/active", self.n8n_headers
+        else:
+            return None
+        
+        async with self.session.get(url, headers=headers) as response:
+            if response.status != 200:
+                raise Exception(f"Status code: {response.status}")
+            return 'connected'
+    
+    async def run(self):
+        """Ejecutar health checks periódicos hasta recibir la señal de apagado"""
+        while not self._shutdown_event.is_set():
+            try:
+                await asyncio.wait_for(self._shutdown_event.wait(), timeout=self._next_interval)
+            except asyncio.TimeoutError:
+                all_healthy = await self._health_check_all()
+                
+                # Espaciar los checks mientras todo esté sano; ante un fallo, re-comprobar
+                # casi de inmediato y, si el fallo persiste, volver al intervalo base
+                if all_healthy:
+                    self._next_interval = min(
+                        max(self._next_interval * 2, HEALTH_CHECK_INTERVAL),
+                        HEALTH_CHECK_MAX_INTERVAL
+                    )
+                elif not self._failing:
+                    self._next_interval = HEALTH_CHECK_RETRY_DELAY
+                else:
+                    self._next_interval = HEALTH_CHECK_INTERVAL
+                self._failing = not all_healthy
+        
+        logger.info("🛑 Recibida señal de apagado")
     
     async def process_email_to_github_workflow(self, email_data: Dict[str, Any]):
         """
@@ -368,32 +584,56 @@ class EnterpriseIntegrationHub:
         logger.info("📧 → 🐙 → 📝 Iniciando workflow Email → GitHub → Notion")
         
         try:
-            # 1. Analizar email usando SCS
-            analysis_data = await self._analyze_email_with_scs(email_data)
+            github_issue = None
+            notion_page = None
+            
+            # 1. Analizar email usando SCS mientras se crea el issue
+            analysis_task = asyncio.create_task(self._analyze_email_with_scs(email_data))
             
-            # 2. Crear issue en GitHub
-            if self.integrations['github'].status == 'connected':
-                github_issue = await self._create_github_issue_from_email(
-                    email_data, analysis_data
+            # 2. Crear issue en GitHub (el análisis se añade cuando esté listo;
+            #    la fecha se fija aquí para que la enmienda no la cambie)
+            issue_date = self._utcnow().isoformat(timespec='seconds')
+            try:
+                if self.integrations['github'].status == 'connected':
+                    github_issue = await self._create_github_issue_from_email(email_data, issue_date)
+                    logger.info("✅ Issue creado en GitHub: %s", github_issue.get('html_url'))
+            except BaseException:
+                # Si la creación del issue falla, no dejar el análisis huérfano
+                analysis_task.cancel()
+                await asyncio.gather(analysis_task, return_exceptions=True)
+                raise
+            
+            analysis_data = await analysis_task
+            
+            amend_task = None
+            if github_issue:
+                amend_task = asyncio.create_task(
+                    self._amend_github_issue(github_issue, email_data, issue_date, analysis_data)
                 )
-                logger.info(f"✅ Issue creado en GitHub: {github_issue.get('html_url')}")
             
             # 3. Crear documentación en Notion
             if self.integrations['notion'].status == 'connected':
                 notion_page = await self._create_notion_documentation(
                     email_data, analysis_data, github_issue
                 )
-                logger.info(f"✅ Documentación creada en Notion: {notion_page.get('url')}")
+                logger.info("✅ Documentación creada en Notion: %s", notion_page.get('url'))
+            
+            if amend_task is not None:
+                await amend_task
             
-            # 4. Notificar en Teams si está disponible
-            await self._notify_teams_workflow_completion(
+            # Los creadores devuelven {} si fallan: tratarlo igual que no haber creado nada
+            if not github_issue and not notion_page:
+                return {"success": False, "error": "no downstream integrations connected"}
+            
+            # 4. Notificar en Teams si está disponible, sin bloquear el workflow
+            self._spawn(self._notify_teams_workflow_completion(
                 "Email → GitHub → Notion",
                 {
                     "email_subject": email_data.get('subject'),
                     "github_issue": github_issue.get('html_url') if github_issue else None,
                     "notion_doc": notion_page.get('url') if notion_page else None
                 }
-            )
+            ))
             
             return {
                 "success": True,
@@ -403,7 +643,7 @@ class EnterpriseIntegrationHub:
             }
             
         except Exception as e:
-            logger.error(f"❌ Error en workflow Email → GitHub → Notion: {e}")
+            logger.error("❌ Error en workflow Email → GitHub → Notion: %s", e)
             return {"success": False, "error": str(e)}
     
     async def _analyze_email_with_scs(self, email_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -423,134 +663,142 @@ class EnterpriseIntegrationHub:
             
             async with self.session.post(
                 f"{self.scs_url}/api/sessions/messages",
-                json=message_payload,
+                data=_dumps(message_payload),
                 headers=self.scs_headers
             ) as response:
                 if response.status == 200:
-                    return await response.json()
+                    return await response.json(loads=_loads)
                 else:
                     return {"analysis": "manual_fallback", "category": "technical_request"}
         except Exception as e:
-            logger.error(f"❌ Error analizando email con SCS: {e}")
+            logger.error("❌ Error analizando email con SCS: %s", e)
             return {"analysis": "error", "error": str(e)}
     
-    async def _create_github_issue_from_email(self, email_data: Dict[str, Any], analysis: Dict[str, Any]) -> Dict[str, Any]:
+    def _build_issue_payload(self, email_data: Dict[str, Any], date: str, analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Construir título, cuerpo y etiquetas del issue a partir del email"""
+        # Extraer información relevante
+        subject = email_data.get('subject', 'Issue from Email')
+        sender = email_data.get('from', 'unknown@example.com')
+        body = email_data.get('body', '')
+        
+        # Construir título y cuerpo del issue
+        issue_body = _ISSUE_TEMPLATE.format(
+            sender=sender,
+            subject=subject,
+            date=date,
+            body=body,
+            analysis_json=_dumps(analysis if analysis is not None else {"analysis": "pending"}, indent=True).decode()
+        )
+        
+        return {
+            "title": f"[EMAIL] {subject}",
+            "body": issue_body,
+            "labels": ["automation", "email-integration"]
+        }
+    
+    async def _create_github_issue_from_email(self, email_data: Dict[str, Any], date: str) -> Dict[str, Any]:
         """Crear issue en GitHub desde email"""
         try:
-            github_token = os.getenv('GITHUB_TOKEN')
-            github_url = os.getenv('GITHUB_ENTERPRISE_URL', 'https://github.com')
-            
-            # Extraer información relevante
-            subject = email_data.get('subject', 'Issue from Email')
-            sender = email_data.get('from', 'unknown@example.com')
-            body = email_data.get('body', '')
-            
-            # Construir título y cuerpo del issue
-            title = f"[EMAIL] {subject}"
-            issue_body = f"""**Issue generado desde email**
-
-**De:** {sender}
-**Asunto:** {subject}
-**Fecha:** {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}
-
----
-
-**Contenido del email:**
-{body}
-
----
-
-**Análisis automático:**
-```json
-{json.dumps(analysis, indent=2)}
-```
-
----
-
-🤖 *Este issue fue creado automáticamente por el Enterprise Integration Hub*
-"""
-            
-            # Crear issue en el repositorio por defecto (esto se puede configurar)
-            issue_data = {
-                "title": title,
-                "body": issue_body,
-                "labels": ["automation", "email-integration"]
-            }
-            
             async with self.session.post(
-                f"{github_url}/repos/omanzanodev/enterprise-integration-hub/issues",
-                json=issue_data,
-                headers={'Authorization': f'token {github_token}'}
+                f"{self.github_url}/repos/{_ISSUES_REPO}/issues",
+                data=_dumps(self._build_issue_payload(email_data, date)),
+                headers=self.github_headers
             ) as response:
                 if response.status == 201:
-                    return await response.json()
+                    return await response.json(loads=_loads)
                 else:
                     raise Exception(f"GitHub API error: {response.status}")
                     
         except Exception as e:
-            logger.error(f"❌ Error creando issue en GitHub: {e}")
+            logger.error("❌ Error creando issue en GitHub: %s", e)
             return {}
     
+    async def _amend_github_issue(self, issue: Dict[str, Any], email_data: Dict[str, Any], date: str, analysis: Dict[str, Any]):
+        """Completar un issue ya creado con el análisis automático"""
+        try:
+            async with self.session.patch(
+                f"{self.github_url}/repos/{_ISSUES_REPO}/issues/{issue['number']}",
+                data=_dumps({"body": self._build_issue_payload(email_data, date, analysis)["body"]}),
+                headers=self.github_headers
+            ) as response:
+                if response.status != 200:
+                    raise Exception(f"GitHub API error: {response.status}")
+                    
+        except Exception as e:
+            logger.error("❌ Error añadiendo análisis al issue de GitHub: %s", e)
+    
     async def _create_notion_documentation(self, email_data: Dict[str, Any], analysis: Dict[str, Any], github_issue: Dict[str, Any]) -> Dict[str, Any]:
         """Crear documentación en Notion"""
         try:
             # Esta es una implementación simulada - en producción usaría las herramientas MCP de Notion
+            # Clave estable entre reinicios para el mismo email (independiente del orden de claves).
+            # Se usa siempre json estándar: orjson formatea algunos floats distinto y la clave
+            # no debe depender de si está instalado
+            canonical = json.dumps(email_data, sort_keys=True, separators=(',', ':'), default=_json_default)
+            entry_key = hashlib.blake2b(canonical.encode('utf-8'), digest_size=8).hexdigest()
+            
             notion_doc = {
                 "title": f"Email Request: {email_data.get('subject', 'Sin asunto')}",
-                "url": f"https://notion.so/entry/{hash(str(email_data))}",
+                "url": f"https://notion.so/entry/{entry_key}",
                 "properties": {
                     "Source": "Email Integration",
                     "Status": "Documented",
                     "GitHub Issue": github_issue.get('html_url') if github_issue else None,
-                    "Created": datetime.now(timezone.utc).isoformat()
+                    "Created": self._utcnow().isoformat()
                 }
             }
             
             return notion_doc
             
         except Exception as e:
-            logger.error(f"❌ Error creando documentación en Notion: {e}")
+            logger.error("❌ Error creando documentación en Notion: %s", e)
             return {}
     
     async def _notify_teams_workflow_completion(self, workflow_name: str, details: Dict[str, Any]):
         """Notificar completion en Teams"""
         try:
-            if self.integrations['microsoft365'].status == 'connected':
+            # El mensaje solo se registra en el log: no serializar si INFO está desactivado
+            if self.integrations['microsoft365'].status == 'connected' and logger.isEnabledFor(logging.INFO):
                 message = f"""✅ **Workflow completado: {workflow_name}**
 
 **Detalles:**
-{json.dumps(details, indent=2)}
+{_dumps(details, indent=True).decode()}
 
 🤖 *Notificación automática de Enterprise Integration Hub*"""
                 
-                logger.info(f"📢 Notificación Teams enviada: {workflow_name}")
+                logger.info("📢 Notificación Teams enviada: %s", workflow_name)
                 
         except Exception as e:
-            logger.error(f"❌ Error notificando en Teams: {e}")
+            logger.error("❌ Error notificando en Teams: %s", e)
     
     async def get_system_status(self) -> Dict[str, Any]:
         """Obtener estado completo del sistema"""
         return {
             "hub_status": "running",
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": self._utcnow().isoformat(),
             "integrations": {
-                name: {
-                    "status": integration.status,
-                    "last_check": integration.last_check.isoformat(),
-                    "metrics": integration.metrics
-                }
+                name: integration.view()
                 for name, integration in self.integrations.items()
             },
             "total_integrations": len(self.integrations),
-            "connected_integrations": sum(1 for i in self.integrations.values() if i.status == 'connected')
+            "connected_integrations": self._connected_count
         }
     
     async def shutdown(self):
         """Apagar el hub de forma segura"""
         logger.info("🛑 Apagando Enterprise Integration Hub...")
         
+        # Dejar terminar las notificaciones pendientes antes de cerrar la sesión
+        if self._bg_tasks:
+            await asyncio.gather(*self._bg_tasks, return_exceptions=True)
+        
         if self.session:
             await self.session.close()
+            # Dar tiempo a que se cierren los transportes SSL
+            await asyncio.sleep(0.25)
+        
+        if self._resolver is not None:
+            await self._resolver.close()
         
         logger.info("✅ Enterprise Integration Hub apagado correctamente")
 
@@ -562,18 +810,17 @@ async def main():
         await hub.initialize()
         
         # Mantener el hub corriendo
-        while True:
-            await asyncio.sleep(60)  # Check every minute
-            
-            # Verificar salud de integraciones periódicamente
-            await hub._health_check_all()
-            
+        await hub.run()
+        
     except KeyboardInterrupt:
         logger.info("🛑 Recibida señal de interrupción")
     except Exception as e:
-        logger.error(f"❌ Error en el hub principal: {e}")
+        logger.error("❌ Error en el hub principal: %s", e)
     finally:
         await hub.shutdown()
 
 if __name__ == "__main__":
+    # Usar el event loop de uvloop si está instalado
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())
\ No newline at end of file